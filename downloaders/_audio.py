@@ -0,0 +1,72 @@
+import os
+import av
+import logging
+from yt_dlp.postprocessor import PostProcessor
+from yt_dlp.utils import PostProcessingError
+from downloaders._postprocessors import CONVERSION_ERROR, LAME_COMPRESSION_LEVEL
+
+logger = logging.getLogger(__name__)
+
+MP3_BITRATE = 192_000
+
+
+def transcode_to_mp3(src_path: str, dst_path: str, bitrate: int = MP3_BITRATE):
+    """
+    Transcodes the first audio stream of src_path to MP3 in-process via libavcodec
+    PyAV converts sample format, layout and frame size for the encoder
+    """
+    with av.open(src_path) as in_container, av.open(dst_path, 'w', format='mp3') as out_container:
+        in_stream = in_container.streams.audio[0]
+        out_stream = out_container.add_stream(
+            'libmp3lame',
+            rate=in_stream.rate or 44100,
+            options={'compression_level': str(LAME_COMPRESSION_LEVEL)}
+        )
+        out_stream.bit_rate = bitrate
+
+        for frame in in_container.decode(in_stream):
+            frame.pts = None
+            for packet in out_stream.encode(frame):
+                out_container.mux(packet)
+
+        for packet in out_stream.encode(None):
+            out_container.mux(packet)
+
+
+class PyAVExtractAudioPP(PostProcessor):
+    """
+    In-process replacement for FFmpegExtractAudio
+    Converts the downloaded webm/m4a to MP3 with PyAV instead of spawning ffmpeg
+    """
+
+    def __init__(self, downloader=None, bitrate: int = MP3_BITRATE):
+        super().__init__(downloader)
+        self._bitrate = bitrate
+
+    def run(self, info):
+        path = info['filepath']
+        mp3_path = os.path.splitext(path)[0] + '.mp3'
+        if path == mp3_path:
+            return [], info
+
+        self.to_screen(f'Transcoding to MP3: {mp3_path}')
+        try:
+            transcode_to_mp3(path, mp3_path, self._bitrate)
+        except (av.error.FFmpegError, IndexError) as e:
+            # IndexError: the source has no audio stream
+            if os.path.exists(mp3_path):
+                os.remove(mp3_path)
+            raise PostProcessingError(f'{CONVERSION_ERROR}: {e}')
+
+        info['filepath'] = mp3_path
+        info['ext'] = 'mp3'
+        # The source file is deleted by yt-dlp after post-processing
+        return [path], info
+
+
+def add_mp3_post_processors(ydl):
+    """
+    Registers the SoundCloud MP3 chain on a YoutubeDL instance: PyAV transcoding only
+    Tags and cover art are written afterwards with mutagen, so no ffmpeg process is started
+    """
+    ydl.add_post_processor(PyAVExtractAudioPP(ydl))
@@ -0,0 +1,55 @@
+import os
+import json
+import queue
+import functools
+import logging
+from typing import Callable, Optional
+from contextlib import contextmanager
+from yt_dlp import YoutubeDL
+
+logger = logging.getLogger(__name__)
+
+# Persistent cache for yt-dlp (player JS, signatures) that survives restarts
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'yt-dlp')
+
+
+@functools.lru_cache(maxsize=None)
+def _get_pool(opts_key: str) -> queue.SimpleQueue:
+    """
+    Returns the queue of idle YoutubeDL instances for the given options
+    One queue is created per unique set of options
+    """
+    return queue.SimpleQueue()
+
+
+@contextmanager
+def pooled_ydl(opts: dict, outtmpl: Optional[str] = None,
+               setup: Optional[Callable[[YoutubeDL], None]] = None):
+    """
+    Borrows a long-lived YoutubeDL instance built from opts (without outtmpl)
+    Warm extractors and player caches are reused between downloads,
+    the output template is set for this download only and then restored
+    outtmpl may be omitted for metadata-only calls
+    setup is called once on new instances, e.g. to register custom postprocessors
+    """
+    opts_key = json.dumps(opts, sort_keys=True)
+    if setup is not None:
+        opts_key += f'|{setup.__module__}.{setup.__qualname__}'
+    pool = _get_pool(opts_key)
+
+    try:
+        ydl = pool.get_nowait()
+    except queue.Empty:
+        logger.debug("Creating new YoutubeDL instance for pool")
+        ydl = YoutubeDL({'cachedir': CACHE_DIR, **opts})
+        if setup is not None:
+            setup(ydl)
+
+    previous_outtmpl = ydl.params.get('outtmpl')
+    if outtmpl is not None:
+        ydl.params['outtmpl'] = {'default': outtmpl}
+    try:
+        yield ydl
+    finally:
+        ydl.params['outtmpl'] = previous_outtmpl
+        pool.put(ydl)
@@ -0,0 +1,37 @@
+import logging
+from yt_dlp.postprocessor import EmbedThumbnailPP, FFmpegExtractAudioPP, FFmpegMetadataPP
+from yt_dlp.utils import PostProcessingError
+
+logger = logging.getLogger(__name__)
+
+# libmp3lame algorithm quality shared by the ffmpeg and PyAV chains:
+# maps to lame -q, 0 is slowest, LAME's default is 3, higher is faster
+LAME_COMPRESSION_LEVEL = 7
+
+# Prefix of conversion errors raised by our postprocessors, download_soundcloud
+# switches to the unconverted download when it sees it in the yt-dlp error
+CONVERSION_ERROR = "Audio conversion failed"
+
+
+class SafeEmbedThumbnailPP(EmbedThumbnailPP):
+    """
+    EmbedThumbnail that never fails the whole download
+    Errors are logged, the cover is then added by the mutagen fallback in download_soundcloud
+    """
+
+    def run(self, info):
+        try:
+            return super().run(info)
+        except PostProcessingError as e:
+            logger.warning("Embedding thumbnail failed: %s", e)
+            return [], info
+
+
+def add_ffmpeg_mp3_post_processors(ydl):
+    """
+    Registers the SoundCloud MP3 chain on a YoutubeDL instance in order:
+    ffmpeg transcoding, metadata and (non-fatal) thumbnail embedding
+    """
+    ydl.add_post_processor(FFmpegExtractAudioPP(ydl, preferredcodec='mp3', preferredquality='192'))
+    ydl.add_post_processor(FFmpegMetadataPP(ydl))
+    ydl.add_post_processor(SafeEmbedThumbnailPP(ydl))
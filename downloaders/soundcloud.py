@@ -1,9 +1,12 @@
 import os
 import re
 import asyncio
+import functools
 import aiofiles
+import aiohttp
+import diskcache
 import logging
-from typing import Optional
+from typing import Optional, Tuple
 from mutagen.mp3 import MP3
 from mutagen.id3 import ID3, TIT2, TPE1, TALB, APIC
 
@@ -13,50 +16,90 @@ logger = logging.getLogger(__name__)
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 TOOLS_PATH = os.path.join(PROJECT_ROOT, 'tools')
 
+_SC_RE = re.compile(r'https?://(?:on\.|m\.)?soundcloud\.com/', re.IGNORECASE)
 
-async def run_yt_dlp(url: str, output_template: str) -> dict:
+# Strips characters that are invalid in filenames and replaces spaces
+_FILENAME_TRANS = str.maketrans({c: None for c in '<>:"/\\|?*'} | {' ': '_'})
+
+# Extensions accepted when looking for the downloaded file
+MEDIA_EXTENSIONS = frozenset({'.mp3', '.m4a', '.webm', '.mp4'})
+
+# Audio files are streamed to Telegram from disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Shared HTTP session for cover art downloads, created lazily on first use
+_SESSION: Optional[aiohttp.ClientSession] = None
+_SESSION_LOCK = asyncio.Lock()
+
+# Slow thumbnail servers must not stall the download
+COVER_ART_TIMEOUT = aiohttp.ClientTimeout(total=10, connect=3)
+
+# On-disk LRU cache of cover art bytes keyed by thumbnail URL. With the PyAV chain
+# every track's cover goes through fetch_cover_art, so album tracks share one fetch
+THUMBNAIL_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'dlbot', 'thumbs')
+THUMBNAIL_CACHE_SIZE = 200 * 1024 * 1024
+
+# Minimum free space kept in the ID3 tag after saving
+ID3_PADDING = 4096
+
+
+async def run_yt_dlp(url: str, output_template: str, ffmpeg_executable: Optional[str] = None,
+                     probe_info: Optional[dict] = None) -> dict:
     """
     Performs asynchronous execution of yt-dlp for processing audio content
+    probe_info is the metadata from probe_size; when given, the extraction is not repeated
     Returns a dictionary with operation results including metadata and file path
     """
-    import yt_dlp
+    from downloaders._pool import pooled_ydl
+    from downloaders._postprocessors import LAME_COMPRESSION_LEVEL
 
-    ffmpeg_executable = await get_ffmpeg_path()
-    logger.info(f"FFmpeg path: {ffmpeg_executable}")
+    try:
+        from downloaders._audio import add_mp3_post_processors
+        # Cover art is fetched by add_metadata_to_mp3 afterwards
+        write_thumbnail = False
+    except ImportError:
+        # PyAV is unavailable: transcode, tag and embed the cover with ffmpeg subprocesses
+        from downloaders._postprocessors import add_ffmpeg_mp3_post_processors as add_mp3_post_processors
+        write_thumbnail = True
+
+    logger.info("FFmpeg path: %s", ffmpeg_executable)
 
     ydl_opts = {
         'format': 'bestaudio/best',
-        'outtmpl': output_template,
         'quiet': True,
         'no_warnings': True,
         'noplaylist': True,
         'extract_flat': False,
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-        }],
+        'writethumbnail': write_thumbnail,
+        'continuedl': True,
+        'nopart': False,
+        # MP3 has no hardware encoder: trade a little quality for a faster LAME algorithm
+        'postprocessor_args': {
+            'ffmpegextractaudio': ['-compression_level', str(LAME_COMPRESSION_LEVEL)],
+        },
     }
 
     if ffmpeg_executable:
         ydl_opts['ffmpeg_location'] = os.path.dirname(ffmpeg_executable)
-        logger.info(f"FFmpeg path set: {os.path.dirname(ffmpeg_executable)}")
+        logger.debug("FFmpeg path set: %s", os.path.dirname(ffmpeg_executable))
 
-    try:
-        logger.info(f"Starting download: {url}")
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            logger.info(f"Track info received: {info.get('title', 'Unknown')}")
+    def _blocking_download() -> dict:
+        with pooled_ydl(ydl_opts, output_template, setup=add_mp3_post_processors) as ydl:
+            if probe_info is None:
+                info = ydl.extract_info(url, download=True)
+            else:
+                info = ydl.process_ie_result(probe_info, download=True)
+            logger.info("Track info received: %s", info.get('title', 'Unknown'))
 
             filename = ydl.prepare_filename(info)
-            logger.info(f"Original filename: {filename}")
+            logger.info("Original filename: %s", filename)
 
             mp3_filename = filename.rsplit('.', 1)[0] + '.mp3'
-            logger.info(f"Expected MP3 name: {mp3_filename}")
+            logger.info("Expected MP3 name: %s", mp3_filename)
 
             final_filename = mp3_filename if os.path.exists(mp3_filename) else filename
-            if os.path.exists(final_filename):
-                logger.info(f"Final file: {final_filename} (size: {os.path.getsize(final_filename)} bytes)")
+            if logger.isEnabledFor(logging.INFO) and os.path.exists(final_filename):
+                logger.info("Final file: %s (size: %s bytes)", final_filename, os.path.getsize(final_filename))
 
             return {
                 'success': True,
@@ -65,8 +108,12 @@ async def run_yt_dlp(url: str, output_template: str) -> dict:
                 'error': None
             }
 
+    try:
+        logger.info("Starting download: %s", url)
+        return await asyncio.to_thread(_blocking_download)
+
     except Exception as e:
-        logger.error(f"Error in run_yt_dlp: {e}")
+        logger.error("Error in run_yt_dlp: %s", e)
         return {
             'success': False,
             'filename': None,
@@ -75,42 +122,80 @@ async def run_yt_dlp(url: str, output_template: str) -> dict:
         }
 
 
-async def get_ffmpeg_path() -> Optional[str]:
+@functools.lru_cache(maxsize=1)
+def get_ffmpeg_path() -> Optional[str]:
     """
     Determines the path to ffmpeg executable in the system
     Priority is given to local installation in the project's tools folder
+    The result is cached, so the filesystem is probed once per process
     """
     try:
-        logger.info(f"Searching for FFmpeg in: {TOOLS_PATH}")
+        logger.info("Searching for FFmpeg in: %s", TOOLS_PATH)
 
         if not os.path.exists(TOOLS_PATH):
-            logger.warning(f"Tools folder not found: {TOOLS_PATH}")
+            logger.warning("Tools folder not found: %s", TOOLS_PATH)
             return None
 
         possible_names = ['ffmpeg.exe', 'ffmpeg'] if os.name == 'nt' else ['ffmpeg']
 
         for name in possible_names:
             ffmpeg_path = os.path.join(TOOLS_PATH, name)
-            logger.info(f"Checking path: {ffmpeg_path}")
+            logger.debug("Checking path: %s", ffmpeg_path)
             if os.path.exists(ffmpeg_path):
-                logger.info(f"FFmpeg found: {ffmpeg_path}")
+                logger.info("FFmpeg found: %s", ffmpeg_path)
                 return ffmpeg_path
 
         import shutil
         logger.info("Searching for FFmpeg in system PATH")
         system_ffmpeg = shutil.which('ffmpeg')
         if system_ffmpeg:
-            logger.info(f"FFmpeg found in system: {system_ffmpeg}")
+            logger.info("FFmpeg found in system: %s", system_ffmpeg)
             return system_ffmpeg
 
         logger.warning("FFmpeg not found in tools folder or system")
         return None
 
     except Exception as e:
-        logger.error(f"Error searching for ffmpeg: {e}")
+        logger.error("Error searching for ffmpeg: %s", e)
         return None
 
 
+async def resolve_ffmpeg_path() -> Optional[str]:
+    """
+    Async wrapper around get_ffmpeg_path
+    Only the first (uncached) lookup is moved to a worker thread
+    """
+    if get_ffmpeg_path.cache_info().currsize:
+        return get_ffmpeg_path()
+    return await asyncio.to_thread(get_ffmpeg_path)
+
+
+def has_embedded_cover(filepath: str) -> bool:
+    """
+    Checks whether the MP3 file already carries an APIC cover frame
+    Only the ID3 header is parsed, the audio stream is not touched
+    """
+    try:
+        return bool(ID3(filepath).getall('APIC'))
+    except Exception:
+        return False
+
+
+def _load_mp3(filepath: str) -> MP3:
+    """
+    Opens the MP3 file with mutagen and makes sure it has an ID3 tag
+    """
+    try:
+        audio = MP3(filepath, ID3=ID3)
+    except:
+        audio = MP3(filepath)
+        audio.add_tags(ID3=ID3)
+
+    if audio.tags is None:
+        audio.add_tags()
+    return audio
+
+
 async def add_metadata_to_mp3(filepath: str, track_info: dict) -> bool:
     """
     Adds ID3 metadata to MP3 file including title, artist and cover art
@@ -118,74 +203,132 @@ async def add_metadata_to_mp3(filepath: str, track_info: dict) -> bool:
     """
     try:
         if not os.path.exists(filepath):
-            logger.error(f"File does not exist for metadata addition: {filepath}")
+            logger.error("File does not exist for metadata addition: %s", filepath)
             return False
 
-        logger.info(f"Adding metadata to file: {filepath}")
+        logger.info("Adding metadata to file: %s", filepath)
 
-        try:
-            audio = MP3(filepath, ID3=ID3)
-        except:
-            audio = MP3(filepath)
-            audio.add_tags(ID3=ID3)
-
-        if audio.tags is None:
-            audio.add_tags()
+        # mutagen has no async API: file reads and writes run in a worker thread
+        audio = await asyncio.to_thread(_load_mp3, filepath)
 
         title = track_info.get('title', '').strip()
         artist = track_info.get('uploader', '').strip() or track_info.get('creator', '').strip()
 
         if title:
             audio.tags.add(TIT2(encoding=3, text=title))
-            logger.info(f"Title added: {title}")
+            logger.info("Title added: %s", title)
         if artist:
             audio.tags.add(TPE1(encoding=3, text=artist))
-            logger.info(f"Artist added: {artist}")
+            logger.info("Artist added: %s", artist)
 
         genre = track_info.get('genre', '')
         if genre:
             audio.tags.add(TALB(encoding=3, text=genre))
-            logger.info(f"Genre added: {genre}")
+            logger.info("Genre added: %s", genre)
 
         thumbnail = track_info.get('thumbnail')
         if thumbnail:
-            logger.info(f"Adding cover art: {thumbnail}")
+            logger.info("Adding cover art: %s", thumbnail)
             await add_cover_art(audio, thumbnail)
 
-        audio.save()
+        # Single write of all frames; reserved padding lets later tag edits
+        # happen in place instead of rewriting the whole MP3
+        audio.tags.update_to_v23()
+        await asyncio.to_thread(
+            audio.save,
+            v2_version=3,
+            padding=lambda info: max(ID3_PADDING, info.padding)
+        )
         logger.info("Metadata successfully added")
         return True
 
     except Exception as e:
-        logger.error(f"Error adding metadata: {e}")
+        logger.error("Error adding metadata: %s", e)
         return False
 
 
+async def _get_session() -> aiohttp.ClientSession:
+    """
+    Returns the shared aiohttp session, creating it on first use
+    Keeps connections and DNS results alive between cover art downloads
+    """
+    global _SESSION
+
+    async with _SESSION_LOCK:
+        if _SESSION is None or _SESSION.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=8, ttl_dns_cache=300)
+            _SESSION = aiohttp.ClientSession(connector=connector)
+        return _SESSION
+
+
+async def close_http_session():
+    """
+    Closes the shared aiohttp session on bot shutdown
+    """
+    global _SESSION
+
+    if _SESSION is not None and not _SESSION.closed:
+        await _SESSION.close()
+        logger.info("HTTP session closed")
+    _SESSION = None
+
+
+@functools.lru_cache(maxsize=1)
+def _get_thumbnail_cache() -> diskcache.Cache:
+    """
+    Opens the on-disk thumbnail cache once per process
+    """
+    return diskcache.Cache(
+        THUMBNAIL_CACHE_DIR,
+        size_limit=THUMBNAIL_CACHE_SIZE,
+        eviction_policy='least-recently-used'
+    )
+
+
+async def fetch_cover_art(thumbnail_url: str) -> bytes:
+    """
+    Returns cover art bytes for the URL, served from the disk cache when possible
+    Raises aiohttp errors on bad status codes and timeouts
+    """
+    # Opening the SQLite-backed cache touches the disk, so it runs in a thread too
+    cache = await asyncio.to_thread(_get_thumbnail_cache)
+    cover_data = await asyncio.to_thread(cache.get, thumbnail_url)
+    if cover_data is not None:
+        logger.info("Cover art taken from cache: %s", thumbnail_url)
+        return cover_data
+
+    logger.info("Downloading cover art: %s", thumbnail_url)
+    session = await _get_session()
+    async with session.get(
+        thumbnail_url,
+        timeout=COVER_ART_TIMEOUT,
+        headers={'Accept-Encoding': 'identity'},
+        raise_for_status=True
+    ) as response:
+        cover_data = await response.read()
+
+    await asyncio.to_thread(cache.set, thumbnail_url, cover_data)
+    return cover_data
+
+
 async def add_cover_art(audio, thumbnail_url: str):
     """
     Downloads and adds track cover art from URL to ID3 tags
     Handles various image formats and network errors
     """
     try:
-        import aiohttp
-        logger.info(f"Downloading cover art: {thumbnail_url}")
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(thumbnail_url) as response:
-                if response.status == 200:
-                    cover_data = await response.read()
-                    audio.tags.add(APIC(
-                        encoding=3,
-                        mime='image/jpeg',
-                        type=3,
-                        desc='Cover',
-                        data=cover_data
-                    ))
-                    logger.info("Cover art successfully added")
-                else:
-                    logger.warning(f"Failed to download cover art: status {response.status}")
+        cover_data = await fetch_cover_art(thumbnail_url)
+        if cover_data:
+            audio.tags.add(APIC(
+                encoding=3,
+                mime='image/jpeg',
+                type=3,
+                desc='Cover',
+                data=cover_data
+            ))
+            logger.info("Cover art successfully added")
     except Exception as e:
-        logger.error(f"Error adding cover art: {e}")
+        logger.error("Error adding cover art: %s", e)
 
 
 def sanitize_filename(filename: str) -> str:
@@ -193,36 +336,37 @@ def sanitize_filename(filename: str) -> str:
     Cleans filename from invalid characters for cross-platform compatibility
     Replaces spaces and limits filename length
     """
-    cleaned = re.sub(r'[<>:"/\\|?*]', '', filename)
-    cleaned = cleaned.replace(' ', '_')
-    return cleaned[:100]
+    return filename.translate(_FILENAME_TRANS)[:100]
 
 
-async def download_soundcloud(url: str, dest_folder: str) -> str:
+async def download_soundcloud(url: str, dest_folder: str, probe_info: Optional[dict] = None) -> str:
     """
     Main handler for SoundCloud content download
     Manages the entire process from download to metadata addition
     Automatically switches to fallback mode when ffmpeg is unavailable
     """
     try:
-        logger.info(f"Starting SoundCloud download: {url}")
-        logger.info(f"Destination folder: {dest_folder}")
+        logger.info("Starting SoundCloud download: %s", url)
+        logger.info("Destination folder: %s", dest_folder)
 
         os.makedirs(dest_folder, exist_ok=True)
         logger.info("Folder created/verified")
 
-        ffmpeg_path = await get_ffmpeg_path()
+        ffmpeg_path = await resolve_ffmpeg_path()
         if not ffmpeg_path:
-            logger.warning("FFmpeg not found, will use download without conversion")
+            logger.warning("FFmpeg not found, conversion relies on PyAV")
 
         output_template = os.path.join(dest_folder, '%(title)s.%(ext)s')
-        logger.info(f"Output file template: {output_template}")
+        logger.info("Output file template: %s", output_template)
 
-        result = await run_yt_dlp(url, output_template)
+        result = await run_yt_dlp(url, output_template, ffmpeg_path, probe_info)
 
         if not result['success']:
-            if "ffmpeg" in result['error'].lower():
-                logger.warning("FFmpeg error, trying to download without conversion")
+            from downloaders._postprocessors import CONVERSION_ERROR
+
+            error = result['error'].lower()
+            if "ffmpeg" in error or CONVERSION_ERROR.lower() in error:
+                logger.warning("Conversion error, trying to download without conversion")
                 return await download_without_conversion(url, dest_folder)
             raise Exception(f"yt-dlp error: {result['error']}")
 
@@ -230,26 +374,30 @@ async def download_soundcloud(url: str, dest_folder: str) -> str:
             raise Exception("Filename not returned")
 
         if not os.path.exists(result['filename']):
-            logger.warning(f"File does not exist: {result['filename']}")
-            files_in_dir = os.listdir(dest_folder)
-            logger.info(f"Files in folder: {files_in_dir}")
-
-            for file in files_in_dir:
-                if file.endswith(('.mp3', '.m4a', '.webm', '.mp4')):
-                    found_file = os.path.join(dest_folder, file)
-                    logger.info(f"File found: {found_file}")
-                    result['filename'] = found_file
-                    break
-            else:
+            logger.warning("File does not exist: %s", result['filename'])
+            with os.scandir(dest_folder) as entries:
+                found_file = next(
+                    (entry.path for entry in entries
+                     if entry.is_file() and os.path.splitext(entry.name)[1].lower() in MEDIA_EXTENSIONS),
+                    None
+                )
+
+            if found_file is None:
                 raise Exception("File was not created")
 
-        logger.info(f"File successfully downloaded: {result['filename']}")
+            logger.info("File found: %s", found_file)
+            result['filename'] = found_file
+
+        logger.info("File successfully downloaded: %s", result['filename'])
 
-        if result['info']:
-            logger.info("Adding metadata...")
+        # The ffmpeg chain embeds tags and cover itself, mutagen is then only used when
+        # EmbedThumbnail was skipped or failed; PyAV output is always tagged with mutagen
+        if (result['info'] and result['filename'].endswith('.mp3')
+                and not await asyncio.to_thread(has_embedded_cover, result['filename'])):
+            logger.info("Cover art not embedded, adding metadata with mutagen...")
             await add_metadata_to_mp3(result['filename'], result['info'])
 
-        logger.info(f"Download completed: {result['filename']}")
+        logger.info("Download completed: %s", result['filename'])
         return result['filename']
 
     except ImportError:
@@ -267,47 +415,68 @@ async def download_without_conversion(url: str, dest_folder: str) -> str:
     Fallback download mode without format conversion
     Used when system ffmpeg is unavailable or conversion errors occur
     """
-    import yt_dlp
+    from downloaders._pool import pooled_ydl
 
     logger.info("Downloading without conversion")
 
     ydl_opts = {
         'format': 'bestaudio/best',
-        'outtmpl': os.path.join(dest_folder, '%(title)s.%(ext)s'),
         'quiet': True,
         'no_warnings': True,
+        'continuedl': True,
+        'nopart': False,
     }
+    output_template = os.path.join(dest_folder, '%(title)s.%(ext)s')
 
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+    def _blocking_download() -> str:
+        with pooled_ydl(ydl_opts, output_template) as ydl:
             info = ydl.extract_info(url, download=True)
-            filename = ydl.prepare_filename(info)
-            logger.info(f"File downloaded without conversion: {filename}")
+            return ydl.prepare_filename(info)
 
-            await add_metadata_to_mp3(filename, info)
+    try:
+        filename = await asyncio.to_thread(_blocking_download)
+        logger.info("File downloaded without conversion: %s", filename)
 
-            return filename
+        return filename
 
     except Exception as e:
-        logger.error(f"Error downloading without conversion: {e}")
+        logger.error("Error downloading without conversion: %s", e)
         raise Exception(f"Error downloading without conversion: {str(e)}")
 
 
+async def probe_size(url: str) -> Tuple[Optional[int], Optional[dict]]:
+    """
+    Metadata-only pass that returns the expected SoundCloud file size in bytes and the extracted info
+    The info is passed on to download_soundcloud so the URL is extracted only once
+    Returns (None, None) when the probe fails
+    """
+    from downloaders._pool import pooled_ydl
+
+    ydl_opts = {
+        'format': 'bestaudio/best',
+        'quiet': True,
+        'no_warnings': True,
+        'noplaylist': True,
+    }
+
+    def _blocking_probe() -> Tuple[Optional[int], dict]:
+        with pooled_ydl(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+        return info.get('filesize') or info.get('filesize_approx'), info
+
+    try:
+        return await asyncio.to_thread(_blocking_probe)
+    except Exception as e:
+        logger.warning("SoundCloud size probe failed for URL %s: %s", url, e)
+        return None, None
+
+
 def is_soundcloud_url(url: str) -> bool:
     """
     SoundCloud URL validator with support for various subdomains and protocols
-    Uses regular expressions for precise platform identification
+    Uses a precompiled regular expression for precise platform identification
     """
-    patterns = [
-        r'https?://soundcloud\.com/',
-        r'https?://on\.soundcloud\.com/',
-        r'https?://m\.soundcloud\.com/',
-    ]
-
-    for pattern in patterns:
-        if re.match(pattern, url, re.IGNORECASE):
-            return True
-    return False
+    return bool(_SC_RE.match(url))
 
 
 async def check_ffmpeg_availability() -> bool:
@@ -315,9 +484,9 @@ async def check_ffmpeg_availability() -> bool:
     Checks ffmpeg availability in the system
     Returns readiness status for audio conversion
     """
-    ffmpeg_path = await get_ffmpeg_path()
+    ffmpeg_path = await resolve_ffmpeg_path()
     available = ffmpeg_path is not None and os.path.exists(ffmpeg_path)
-    logger.info(f"FFmpeg available: {available}")
+    logger.info("FFmpeg available: %s", available)
     return available
 
 
@@ -329,15 +498,19 @@ async def send_audio_to_telegram(bot, chat_id, file_path, caption=""):
     try:
         from aiogram.types import FSInputFile
 
-        audio_file = FSInputFile(file_path)
+        audio_file = FSInputFile(
+            file_path,
+            filename=os.path.basename(file_path),
+            chunk_size=UPLOAD_CHUNK_SIZE
+        )
         await bot.send_audio(
             chat_id=chat_id,
             audio=audio_file,
             caption=caption
         )
 
-        logger.info(f"Audio sent: {os.path.basename(file_path)}")
+        logger.info("Audio sent: %s", os.path.basename(file_path))
 
     except Exception as e:
-        logger.error(f"Error sending audio to Telegram: {e}")
+        logger.error("Error sending audio to Telegram: %s", e)
         raise
\ No newline at end of file
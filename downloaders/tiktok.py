@@ -1,7 +1,8 @@
 import os
 import asyncio
-from yt_dlp import YoutubeDL
+from downloaders._pool import pooled_ydl
 import logging
+from typing import Optional, Tuple
 
 # Logging settings
 logger = logging.getLogger(__name__)
@@ -11,58 +12,87 @@ YTDL_OPTS = {
     "noplaylist": True,
     "quiet": True,
     "no_warnings": True,
+    "concurrent_fragment_downloads": 8,
+    "http_chunk_size": 10 * 1024 * 1024,
+    "retries": 3,
+    "fragment_retries": 3,
+    "socket_timeout": 15,
+    "continuedl": True,
+    "nopart": False,
 }
 
 
-async def download_tiktok(url: str, dest_folder: str) -> str:
+async def download_tiktok(url: str, dest_folder: str, probe_info: Optional[dict] = None) -> str:
     """
     Asynchronous content downloader for TikTok platform
     Uses yt-dlp to process various TikTok video formats
+    probe_info is the metadata from probe_size; when given, the extraction is not repeated
     Returns the absolute path to the downloaded media file
     """
-    logger.info(f"Starting TikTok download for URL: {url}")
-    logger.debug(f"Destination folder: {dest_folder}")
+    logger.info("Starting TikTok download for URL: %s", url)
+    logger.debug("Destination folder: %s", dest_folder)
 
-    loop = asyncio.get_event_loop()
+    loop = asyncio.get_running_loop()
 
     def run():
         try:
-            download_opts = {
-                **YTDL_OPTS,
-                "outtmpl": os.path.join(dest_folder, "%(id)s.%(ext)s")
-            }
+            outtmpl = os.path.join(dest_folder, "%(id)s.%(ext)s")
 
-            logger.debug(f"YT-DLP options for TikTok: {download_opts}")
+            logger.debug("YT-DLP options for TikTok: %s, outtmpl: %s", YTDL_OPTS, outtmpl)
 
-            with YoutubeDL(download_opts) as ydl:
+            with pooled_ydl(YTDL_OPTS, outtmpl) as ydl:
                 logger.info("Extracting TikTok video info...")
-                video_info = ydl.extract_info(url, download=True)
+                if probe_info is None:
+                    video_info = ydl.extract_info(url, download=True)
+                else:
+                    video_info = ydl.process_ie_result(probe_info, download=True)
 
                 filename = ydl.prepare_filename(video_info)
                 file_size = os.path.getsize(filename) if os.path.exists(filename) else 0
 
-                logger.info(f"TikTok download completed: {filename} ({file_size} bytes)")
+                logger.info("TikTok download completed: %s (%s bytes)", filename, file_size)
 
                 # Логируем дополнительную информацию о видео
                 if video_info:
-                    logger.debug(f"TikTok video info: {video_info.get('title', 'Unknown title')} "
-                                 f"(duration: {video_info.get('duration', 'N/A')}s, "
-                                 f"uploader: {video_info.get('uploader', 'N/A')})")
+                    logger.debug("TikTok video info: %s (duration: %ss, uploader: %s)",
+                                 video_info.get('title', 'Unknown title'),
+                                 video_info.get('duration', 'N/A'),
+                                 video_info.get('uploader', 'N/A'))
 
                 return filename
 
         except Exception as e:
-            logger.error(f"TikTok download error for URL {url}: {e}", exc_info=True)
+            logger.error("TikTok download error for URL %s: %s", url, e, exc_info=True)
             raise
 
     try:
         result = await loop.run_in_executor(None, run)
-        logger.info(f"TikTok download successful: {result}")
+        logger.info("TikTok download successful: %s", result)
         return result
 
     except asyncio.CancelledError:
-        logger.warning(f"TikTok download cancelled for URL: {url}")
+        logger.warning("TikTok download cancelled for URL: %s", url)
         raise
     except Exception as e:
-        logger.error(f"Async TikTok download failed for URL {url}: {e}", exc_info=True)
-        raise
\ No newline at end of file
+        logger.error("Async TikTok download failed for URL %s: %s", url, e, exc_info=True)
+        raise
+
+
+async def probe_size(url: str) -> Tuple[Optional[int], Optional[dict]]:
+    """
+    Metadata-only pass that returns the expected TikTok file size in bytes and the extracted info
+    The info is passed on to download_tiktok so the URL is extracted only once
+    Returns (None, None) when the probe fails
+    """
+    loop = asyncio.get_running_loop()
+
+    def run():
+        with pooled_ydl(YTDL_OPTS) as ydl:
+            video_info = ydl.extract_info(url, download=False)
+        return video_info.get('filesize') or video_info.get('filesize_approx'), video_info
+
+    try:
+        return await loop.run_in_executor(None, run)
+    except Exception as e:
+        logger.warning("TikTok size probe failed for URL %s: %s", url, e)
+        return None, None
\ No newline at end of file
@@ -1,7 +1,8 @@
 import os
 import asyncio
-from yt_dlp import YoutubeDL
+from downloaders._pool import pooled_ydl
 import logging
+from typing import Optional, Tuple
 
 # Logging settings
 logger = logging.getLogger(__name__)
@@ -11,52 +12,83 @@ YTDL_OPTS = {
     "noplaylist": True,
     "quiet": True,
     "no_warnings": True,
+    "concurrent_fragment_downloads": 8,
+    "http_chunk_size": 10 * 1024 * 1024,
+    "retries": 3,
+    "fragment_retries": 3,
+    "socket_timeout": 15,
+    "continuedl": True,
+    "nopart": False,
 }
 
 
-async def download_youtube(url: str, dest_folder: str) -> str:
+async def download_youtube(url: str, dest_folder: str, probe_info: Optional[dict] = None) -> str:
     """
     Asynchronous YouTube content downloader including Shorts and standard videos
     Uses optimized yt-dlp parameters for maximum quality
+    probe_info is the metadata from probe_size; when given, the extraction is not repeated
     Returns the path to the downloaded media file in MP4 format
     """
-    logger.info(f"Starting YouTube download for URL: {url}")
-    logger.debug(f"Destination folder: {dest_folder}")
+    logger.info("Starting YouTube download for URL: %s", url)
+    logger.debug("Destination folder: %s", dest_folder)
 
-    loop = asyncio.get_event_loop()
+    loop = asyncio.get_running_loop()
 
     def run():
         try:
             outtmpl = os.path.join(dest_folder, "%(id)s.%(ext)s")
-            ydl_opts = {**YTDL_OPTS, "outtmpl": outtmpl}
 
-            logger.debug(f"YT-DLP options: {ydl_opts}")
+            logger.debug("YT-DLP options: %s, outtmpl: %s", YTDL_OPTS, outtmpl)
 
-            with YoutubeDL(ydl_opts) as ydl:
+            with pooled_ydl(YTDL_OPTS, outtmpl) as ydl:
                 logger.info("Extracting video info...")
-                video_info = ydl.extract_info(url, download=True)
+                if probe_info is None:
+                    video_info = ydl.extract_info(url, download=True)
+                else:
+                    video_info = ydl.process_ie_result(probe_info, download=True)
 
                 filename = ydl.prepare_filename(video_info)
                 file_size = os.path.getsize(filename) if os.path.exists(filename) else 0
 
-                logger.info(f"Download completed: {filename} ({file_size} bytes)")
-                logger.debug(f"Video info: {video_info.get('title', 'Unknown title')} "
-                             f"(duration: {video_info.get('duration', 'N/A')}s)")
+                logger.info("Download completed: %s (%s bytes)", filename, file_size)
+                logger.debug("Video info: %s (duration: %ss)",
+                             video_info.get('title', 'Unknown title'),
+                             video_info.get('duration', 'N/A'))
 
                 return filename
 
         except Exception as e:
-            logger.error(f"YouTube download error for URL {url}: {e}", exc_info=True)
+            logger.error("YouTube download error for URL %s: %s", url, e, exc_info=True)
             raise
 
     try:
         result = await loop.run_in_executor(None, run)
-        logger.info(f"YouTube download successful: {result}")
+        logger.info("YouTube download successful: %s", result)
         return result
 
     except asyncio.CancelledError:
-        logger.warning(f"YouTube download cancelled for URL: {url}")
+        logger.warning("YouTube download cancelled for URL: %s", url)
         raise
     except Exception as e:
-        logger.error(f"Async YouTube download failed for URL {url}: {e}", exc_info=True)
-        raise
\ No newline at end of file
+        logger.error("Async YouTube download failed for URL %s: %s", url, e, exc_info=True)
+        raise
+
+
+async def probe_size(url: str) -> Tuple[Optional[int], Optional[dict]]:
+    """
+    Metadata-only pass that returns the expected YouTube file size in bytes and the extracted info
+    The info is passed on to download_youtube so the URL is extracted only once
+    Returns (None, None) when the probe fails
+    """
+    loop = asyncio.get_running_loop()
+
+    def run():
+        with pooled_ydl(YTDL_OPTS) as ydl:
+            video_info = ydl.extract_info(url, download=False)
+        return video_info.get('filesize') or video_info.get('filesize_approx'), video_info
+
+    try:
+        return await loop.run_in_executor(None, run)
+    except Exception as e:
+        logger.warning("YouTube size probe failed for URL %s: %s", url, e)
+        return None, None
\ No newline at end of file
@@ -1,23 +1,42 @@
 import asyncio
 import os
-import tempfile
+import re
+import time
+import shutil
+import hashlib
+import weakref
 import logging
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from aiogram import Bot, Dispatcher, types
 from aiogram.types import Message, FSInputFile, CallbackQuery
 from aiogram.filters import Command
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from dotenv import load_dotenv
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 from downloaders.tiktok import download_tiktok
 from downloaders.youtube import download_youtube
 from downloaders.soundcloud import download_soundcloud
 from downloaders.soundcloud import send_audio_to_telegram
+from downloaders.tiktok import probe_size as probe_tiktok_size
+from downloaders.youtube import probe_size as probe_youtube_size
+from downloaders.soundcloud import probe_size as probe_soundcloud_size
+from downloaders.soundcloud import close_http_session
 
 # env
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
 # Logging settings
+# Thread/process info is not used in the format, skip collecting it per record
+logging.logThreads = False
+logging.logProcesses = False
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -30,9 +49,49 @@ logger = logging.getLogger(__name__)
 
 bot = Bot(token=BOT_TOKEN)
 dp = Dispatcher()
-
-progress_message = None
-
+dp.shutdown.register(close_http_session)
+
+# Videos are streamed to Telegram from disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+URL_PATTERN = re.compile(r'https?://\S+')
+# Punctuation that sticks to a link at the end of a sentence
+URL_TRAILING_CHARS = '.,;:!?)]>"\''
+MAX_SIZE = 49 * 1024 * 1024
+# Every running download holds one executor thread for its whole duration;
+# the spare threads serve short jobs (aiofiles, mutagen, diskcache, rmtree, DNS)
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "4"))
+MAX_PARALLEL_DOWNLOADS = DOWNLOAD_WORKERS
+EXECUTOR_SPARE_WORKERS = 4
+PROGRESS_EDIT_INTERVAL = 0.5
+
+# Per-URL download folders are kept between attempts so yt-dlp can resume .part files
+DOWNLOAD_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'dlbot', 'downloads')
+DOWNLOAD_CACHE_TTL = 24 * 60 * 60
+DOWNLOAD_CACHE_SWEEP_INTERVAL = 60 * 60
+_download_locks = weakref.WeakValueDictionary()
+download_semaphore = asyncio.Semaphore(MAX_PARALLEL_DOWNLOADS)
+
+# URL routing: the named group that matches is the platform key
+_ROUTER = re.compile(
+    r'(?P<tiktok>tiktok\.com)|(?P<youtube>youtube\.com|youtu\.be)|(?P<soundcloud>soundcloud\.com)',
+    re.IGNORECASE
+)
+_DISPATCH = {
+    "tiktok": download_tiktok,
+    "youtube": download_youtube,
+    "soundcloud": download_soundcloud,
+}
+_PROBES = {
+    "tiktok": probe_tiktok_size,
+    "youtube": probe_youtube_size,
+    "soundcloud": probe_soundcloud_size,
+}
+PLATFORM_NAMES = {
+    "tiktok": "TikTok",
+    "youtube": "YouTube",
+    "soundcloud": "SoundCloud",
+}
 
 
 async def update_progress_message(chat_id, text, message_id=None):
@@ -42,7 +101,7 @@ async def update_progress_message(chat_id, text, message_id=None):
     """
     progress_text = f"🔄 *{text}*"
 
-    logger.info(f"Progress update for chat {chat_id}: {text}")
+    logger.info("Progress update for chat %s: %s", chat_id, text)
 
     if message_id:
         try:
@@ -54,7 +113,7 @@ async def update_progress_message(chat_id, text, message_id=None):
             )
             return message_id
         except Exception as e:
-            logger.warning(f"Failed to edit progress message: {e}")
+            logger.warning("Failed to edit progress message: %s", e)
 
     msg = await bot.send_message(
         chat_id=chat_id,
@@ -64,6 +123,109 @@ async def update_progress_message(chat_id, text, message_id=None):
     return msg.message_id
 
 
+class ProgressTracker:
+    """
+    Progress message of a single link
+    Skips edits with unchanged text and coalesces edits sent faster than PROGRESS_EDIT_INTERVAL
+    """
+
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self.message_id = None
+        self._last_text = None
+        self._last_edit = 0.0
+        self._pending_text = None
+        self._flush_task = None
+        # Serializes Telegram calls so a stale edit can never land after a newer one
+        self._lock = asyncio.Lock()
+
+    async def update(self, text: str, force: bool = False):
+        """Shows text in the progress message, force sends it without throttling"""
+        self._pending_text = text
+
+        if self.message_id is None or force:
+            self._cancel_flush()
+            await self._flush()
+        elif self._flush_task is None:
+            delay = max(0.0, self._last_edit + PROGRESS_EDIT_INTERVAL - asyncio.get_running_loop().time())
+            self._flush_task = asyncio.create_task(self._flush_after(delay))
+
+    async def delete(self):
+        """Drops pending edits and removes the progress message"""
+        self._cancel_flush()
+        self._pending_text = None
+
+        async with self._lock:
+            if self.message_id is not None:
+                message_id, self.message_id = self.message_id, None
+                await bot.delete_message(self.chat_id, message_id)
+
+    async def _flush_after(self, delay: float):
+        # The task stays referenced until it finishes, so forced updates can cancel an edit in flight
+        try:
+            await asyncio.sleep(delay)
+            await self._flush()
+            # Text that arrived during the edit is sent after another interval
+            while self._pending_text is not None:
+                await asyncio.sleep(PROGRESS_EDIT_INTERVAL)
+                await self._flush()
+        except Exception as e:
+            logger.warning("Failed to flush progress message: %s", e)
+        finally:
+            if self._flush_task is asyncio.current_task():
+                self._flush_task = None
+
+    async def _flush(self):
+        async with self._lock:
+            text, self._pending_text = self._pending_text, None
+            if text is None or text == self._last_text:
+                return
+
+            self.message_id = await update_progress_message(self.chat_id, text, self.message_id)
+            self._last_text = text
+            self._last_edit = asyncio.get_running_loop().time()
+
+    def _cancel_flush(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+
+
+@asynccontextmanager
+async def download_dir_for(url: str):
+    """
+    Yields the persistent download folder for the URL, keyed by its hash
+    Concurrent requests for the same URL wait for each other instead of sharing partial files
+    """
+    key = hashlib.sha1(url.encode()).hexdigest()[:16]
+    path = os.path.join(DOWNLOAD_CACHE_DIR, key)
+    lock = _download_locks.setdefault(key, asyncio.Lock())
+
+    async with lock:
+        os.makedirs(path, exist_ok=True)
+        # Refresh the mtime so a reused folder is not swept while in use
+        os.utime(path)
+        yield path
+
+
+def sweep_download_cache(busy_keys: frozenset = frozenset()):
+    """
+    Removes download folders that were not touched for DOWNLOAD_CACHE_TTL seconds
+    Folders in busy_keys belong to running downloads and are skipped
+    """
+    if not os.path.isdir(DOWNLOAD_CACHE_DIR):
+        return
+
+    cutoff = time.time() - DOWNLOAD_CACHE_TTL
+    with os.scandir(DOWNLOAD_CACHE_DIR) as entries:
+        for entry in entries:
+            if entry.name in busy_keys:
+                continue
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                logger.info("Removing stale download folder: %s", entry.path)
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
 async def send_success_message(chat_id, platform, filename):
     """Sends a standardized success message after content download"""
     success_messages = {
@@ -74,7 +236,7 @@ async def send_success_message(chat_id, platform, filename):
 
     text = f"{success_messages.get(platform, '✅ *File is ready!*')}\n\n📁 *{filename}*"
 
-    logger.info(f"Successfully processed {platform} file: {filename} for chat {chat_id}")
+    logger.info("Successfully processed %s file: %s for chat %s", platform, filename, chat_id)
 
     await bot.send_message(
         chat_id=chat_id,
@@ -83,27 +245,42 @@ async def send_success_message(chat_id, platform, filename):
     )
 
 
-async def choose_downloader(url: str, dest_folder: str, chat_id: int, progress_msg_id: int) -> str:
-    """Determines the appropriate downloader based on domain and starts the download process"""
-    logger.info(f"Choosing downloader for URL: {url}")
-
-    if "tiktok.com" in url or "vm.tiktok.com" in url:
-        await update_progress_message(chat_id, "Downloading from TikTok...", progress_msg_id)
-        logger.info(f"Selected TikTok downloader for URL: {url}")
-        return await download_tiktok(url, dest_folder), "tiktok"
-    elif "youtube.com" in url or "youtu.be" in url:
-        await update_progress_message(chat_id, "Downloading from YouTube...", progress_msg_id)
-        logger.info(f"Selected YouTube downloader for URL: {url}")
-        return await download_youtube(url, dest_folder), "youtube"
-    elif "soundcloud.com" in url:
-        await update_progress_message(chat_id, "Downloading from SoundCloud...", progress_msg_id)
-        logger.info(f"Selected SoundCloud downloader for URL: {url}")
-        return await download_soundcloud(url, dest_folder), "soundcloud"
-    else:
+def detect_platform(url: str) -> Optional[str]:
+    """Returns the platform key for the URL's domain or None when the source is unsupported"""
+    match = _ROUTER.search(url)
+    return match.lastgroup if match else None
+
+
+async def choose_downloader(url: str, dest_folder: str, progress: ProgressTracker,
+                            probe_info: Optional[dict] = None) -> str:
+    """
+    Determines the appropriate downloader based on domain and starts the download process
+    probe_info from probe_media_size is reused so the URL is not extracted twice
+    """
+    logger.info("Choosing downloader for URL: %s", url)
+
+    platform = detect_platform(url)
+    if platform is None:
         error_msg = f"Unsupported source: {url}"
         logger.warning(error_msg)
         raise ValueError(error_msg)
 
+    platform_name = PLATFORM_NAMES[platform]
+    await progress.update(f"Downloading from {platform_name}...")
+    logger.info("Selected %s downloader for URL: %s", platform_name, url)
+    return await _DISPATCH[platform](url, dest_folder, probe_info), platform
+
+
+async def probe_media_size(url: str) -> Tuple[Optional[int], Optional[dict]]:
+    """
+    Runs a metadata-only size probe with the downloader matching the URL's domain
+    Returns the expected size and the extracted info for the download step
+    """
+    platform = detect_platform(url)
+    if platform is None:
+        return None, None
+    return await _PROBES[platform](url)
+
 
 def get_start_keyboard():
     """Creates an inline keyboard for the start message with content examples"""
@@ -148,7 +325,7 @@ def get_help_keyboard():
 @dp.message(Command("start"))
 async def cmd_start(message: Message):
     """Handler for the /start command - welcome message with functionality description"""
-    logger.info(f"Start command received from user {message.from_user.id} ({message.from_user.username})")
+    logger.info("Start command received from user %s (%s)", message.from_user.id, message.from_user.username)
 
     welcome_text = (
         "✨ *Welcome to Downloader Bot!*\n\n"
@@ -171,7 +348,7 @@ async def cmd_start(message: Message):
 @dp.callback_query(lambda c: c.data == "help")
 async def process_help(callback_query: CallbackQuery):
     """Callback handler for displaying usage instructions"""
-    logger.info(f"Help callback from user {callback_query.from_user.id}")
+    logger.info("Help callback from user %s", callback_query.from_user.id)
 
     help_text = (
         "📖 *Usage Instructions:*\n\n"
@@ -192,7 +369,7 @@ async def process_help(callback_query: CallbackQuery):
             reply_markup=get_help_keyboard()
         )
     except Exception as e:
-        logger.error(f"Error editing help message: {e}")
+        logger.error("Error editing help message: %s", e)
         await callback_query.message.answer(
             text=help_text,
             parse_mode="Markdown",
@@ -205,7 +382,7 @@ async def process_help(callback_query: CallbackQuery):
 @dp.callback_query(lambda c: c.data == "back_to_start")
 async def process_back(callback_query: CallbackQuery):
     """Callback handler for returning to the start message"""
-    logger.info(f"Back to start callback from user {callback_query.from_user.id}")
+    logger.info("Back to start callback from user %s", callback_query.from_user.id)
 
     welcome_text = (
         "✨ *Welcome to MediaDownloader Bot!*\n\n"
@@ -225,7 +402,7 @@ async def process_back(callback_query: CallbackQuery):
             reply_markup=get_start_keyboard()
         )
     except Exception as e:
-        logger.error(f"Error editing back message: {e}")
+        logger.error("Error editing back message: %s", e)
         await callback_query.message.answer(
             text=welcome_text,
             parse_mode="Markdown",
@@ -238,7 +415,7 @@ async def process_back(callback_query: CallbackQuery):
 @dp.message(Command("help"))
 async def cmd_help(message: Message):
     """Handler for the /help command - displays brief bot usage instructions"""
-    logger.info(f"Help command received from user {message.from_user.id}")
+    logger.info("Help command received from user %s", message.from_user.id)
 
     help_text = (
         "🤖 *MediaDownloader Bot - Help*\n\n"
@@ -256,20 +433,102 @@ async def cmd_help(message: Message):
     await message.answer(help_text, parse_mode="Markdown")
 
 
-@dp.message()
-async def handle_link(message: Message):
-    """Main handler for incoming messages - analyzes links and starts the download process"""
-    global progress_message
+async def process_link(message: Message, url: str):
+    """
+    Downloads a single link and sends the result back to the chat
+    Any error is logged here, so one failing link never cancels the other links of the message
+    """
+    try:
+        await _process_link(message, url)
+    except Exception as e:
+        logger.error("Unhandled error for URL %s: %s", url, e, exc_info=True)
+
 
-    url = message.text.strip()
+async def _process_link(message: Message, url: str):
     chat_id = message.chat.id
     user_id = message.from_user.id
+
+    # Unsupported links never take a download slot, a probe or a cache folder
+    if detect_platform(url) is None:
+        logger.warning("Unsupported source: %s", url)
+        await message.answer(f"❌ *Error:* Unsupported source: {url}", parse_mode="Markdown")
+        return
+
+    async with download_semaphore:
+        progress = ProgressTracker(chat_id)
+        await progress.update("Checking link...")
+
+        expected_size, probe_info = await probe_media_size(url)
+        if expected_size and expected_size > MAX_SIZE:
+            logger.warning("File too large before download: %s bytes (max %s)", expected_size, MAX_SIZE)
+            await progress.update("❌ File is too large for Telegram (maximum 50MB)", force=True)
+            return
+
+        async with download_dir_for(url) as download_dir:
+            try:
+                logger.info("Starting download process for URL: %s", url)
+                file_path, platform = await choose_downloader(url, download_dir, progress, probe_info)
+                await progress.update("Sending file...")
+
+            except Exception as e:
+                error_text = f"❌ *Error:* {str(e)}"
+                logger.error("Download error for URL %s: %s", url, e, exc_info=True)
+                await progress.update(error_text, force=True)
+                return
+
+            if not os.path.exists(file_path):
+                logger.error("File not found after download: %s", file_path)
+                await progress.update("❌ File not found", force=True)
+                return
+
+            filesize = os.path.getsize(file_path)
+
+            file_extension = os.path.splitext(file_path)[1].lower()
+            filename = os.path.basename(file_path)
+
+            logger.info("Download completed: %s (%s bytes)", filename, filesize)
+
+            try:
+                if filesize <= MAX_SIZE:
+                    await progress.delete()
+
+                    if file_extension == '.mp3':
+                        logger.info("Sending audio file: %s", filename)
+                        await send_audio_to_telegram(bot, chat_id, file_path)
+                    else:
+                        logger.info("Sending video file: %s", filename)
+                        video = FSInputFile(file_path, filename=filename, chunk_size=UPLOAD_CHUNK_SIZE)
+                        await message.answer_video(video=video)
+
+                    await send_success_message(chat_id, platform, filename)
+                    logger.info("File successfully sent to user %s", user_id)
+                    await asyncio.to_thread(shutil.rmtree, download_dir, ignore_errors=True)
+
+                else:
+                    error_msg = f"File too large: {filesize} bytes (max {MAX_SIZE})"
+                    logger.warning(error_msg)
+                    await progress.update("❌ File is too large for Telegram (maximum 50MB)", force=True)
+                    await asyncio.to_thread(shutil.rmtree, download_dir, ignore_errors=True)
+
+            except Exception as e:
+                error_text = f"❌ *Sending error:* {str(e)}"
+                logger.error("Error sending file %s: %s", filename, e, exc_info=True)
+                await progress.update(error_text, force=True)
+
+
+@dp.message()
+async def handle_link(message: Message):
+    """Main handler for incoming messages - extracts links and downloads them concurrently"""
+    text = message.text or ""
+    user_id = message.from_user.id
     username = message.from_user.username
 
-    logger.info(f"Message received from user {user_id} (@{username}): {url}")
+    logger.info("Message received from user %s (@%s): %s", user_id, username, text)
 
-    if not url.startswith(('http://', 'https://')):
-        logger.warning(f"Invalid URL format from user {user_id}: {url}")
+    # Repeated links are processed once, in the order they first appear
+    urls = list(dict.fromkeys(url.rstrip(URL_TRAILING_CHARS) for url in URL_PATTERN.findall(text)))
+    if not urls:
+        logger.warning("Invalid URL format from user %s: %s", user_id, text)
         await message.answer(
             "❌ *Please send a valid link.*\n\n"
             "Examples:\n"
@@ -280,61 +539,22 @@ async def handle_link(message: Message):
         )
         return
 
-    progress_msg_id = await update_progress_message(chat_id, "Checking link...")
+    logger.info("Processing %s link(s) from user %s", len(urls), user_id)
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        try:
-            logger.info(f"Starting download process for URL: {url}")
-            file_path, platform = await choose_downloader(url, tmpdir, chat_id, progress_msg_id)
-            await update_progress_message(chat_id, "Sending file...", progress_msg_id)
+    async with asyncio.TaskGroup() as tg:
+        for url in urls:
+            tg.create_task(process_link(message, url))
 
-        except Exception as e:
-            error_text = f"❌ *Error:* {str(e)}"
-            logger.error(f"Download error for URL {url}: {e}", exc_info=True)
-            await update_progress_message(chat_id, error_text, progress_msg_id)
-            return
-
-        if not os.path.exists(file_path):
-            logger.error(f"File not found after download: {file_path}")
-            await update_progress_message(chat_id, "❌ File not found", progress_msg_id)
-            return
-
-        filesize = os.path.getsize(file_path)
-        MAX_SIZE = 49 * 1024 * 1024
-
-        file_extension = os.path.splitext(file_path)[1].lower()
-        filename = os.path.basename(file_path)
-
-        logger.info(f"Download completed: {filename} ({filesize} bytes)")
 
+async def sweep_download_cache_periodically():
+    """Sweeps the download cache at startup and then every DOWNLOAD_CACHE_SWEEP_INTERVAL seconds"""
+    while True:
         try:
-            if filesize <= MAX_SIZE:
-                await bot.delete_message(chat_id, progress_msg_id)
-
-                if file_extension == '.mp3':
-                    logger.info(f"Sending audio file: {filename}")
-                    await send_audio_to_telegram(bot, chat_id, file_path)
-                else:
-                    logger.info(f"Sending video file: {filename}")
-                    video = FSInputFile(file_path)
-                    await message.answer_video(video=video)
-
-                await send_success_message(chat_id, platform, filename)
-                logger.info(f"File successfully sent to user {user_id}")
-
-            else:
-                error_msg = f"File too large: {filesize} bytes (max {MAX_SIZE})"
-                logger.warning(error_msg)
-                await update_progress_message(
-                    chat_id,
-                    "❌ File is too large for Telegram (maximum 50MB)",
-                    progress_msg_id
-                )
-
+            busy_keys = frozenset(key for key, lock in _download_locks.items() if lock.locked())
+            await asyncio.to_thread(sweep_download_cache, busy_keys)
         except Exception as e:
-            error_text = f"❌ *Sending error:* {str(e)}"
-            logger.error(f"Error sending file {filename}: {e}", exc_info=True)
-            await update_progress_message(chat_id, error_text, progress_msg_id)
+            logger.error("Download cache sweep failed: %s", e, exc_info=True)
+        await asyncio.sleep(DOWNLOAD_CACHE_SWEEP_INTERVAL)
 
 
 async def main():
@@ -342,14 +562,25 @@ async def main():
     logger.info("🤖 Bot starting...")
     print("🤖 Bot started...")
 
+    # Shared bounded pool for all blocking work (asyncio.to_thread / run_in_executor)
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS + EXECUTOR_SPARE_WORKERS, thread_name_prefix='dl')
+    )
+    sweeper = asyncio.create_task(sweep_download_cache_periodically())
+
     try:
         await dp.start_polling(bot)
     except Exception as e:
-        logger.critical(f"Bot crashed: {e}", exc_info=True)
+        logger.critical("Bot crashed: %s", e, exc_info=True)
         raise
     finally:
+        sweeper.cancel()
         logger.info("Bot stopped")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    # libuv-based event loop where available (not supported on Windows)
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
\ No newline at end of file